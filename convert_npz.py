@@ -0,0 +1,80 @@
+import numpy as np
+import json
+import os
+import sys
+import tempfile
+
+from miriperformance_tools import NPZ_FORMAT_VERSION
+
+
+def convert_npz(infile, outfile=None):
+
+    '''Function that will rewrite an ETC .npz data file so that it can be read without pickle.
+
+    Parameters
+    ----------
+    - infile (string): path to the .npz file to convert
+    - outfile (string): path to write the converted file to. default: overwrite infile
+
+    Notes:
+    ------
+    - object arrays holding one array per configuration (e.g. the 12 MRS sub-bands) are stored as one flat float array each, with the values for all configurations one after another
+    - the 'configs' dictionaries are stored as an array of JSON strings
+    - a 'layout' member, a JSON string, marks the file as converted and holds the format version and the offsets at which each configuration starts in the flat arrays
+    - miriperformance_tools.load_data() splits the flat arrays up again, so it returns the same dictionary for converted and original files
+    - an infile that has already been converted is left as it is, and nothing is written
+    - the output is written with np.savez (uncompressed), not np.savez_compressed
+    - the output goes to a temporary file that then replaces outfile, so memory-mapped arrays already loaded from the old file stay valid
+
+    '''
+
+    if outfile is None:
+        outfile = infile
+
+    with np.load(infile, encoding='bytes', allow_pickle=True) as data:
+        if 'layout' in data.files:
+            return
+
+        out = {}
+        ragged = {}
+        for k in data.files:
+            arr = data[k]
+            if not arr.dtype.hasobject:
+                out[k] = arr
+            elif k == 'configs':
+                out[k] = np.array([json.dumps(_decode_config(c)) for c in arr])
+            else:
+                parts = [np.asarray(a, dtype=np.float64) for a in arr]
+                out[k] = np.concatenate(parts)
+                ragged[k] = np.cumsum([0] + [len(a) for a in parts]).tolist()
+        out['layout'] = np.array(json.dumps({'format_version': NPZ_FORMAT_VERSION, 'ragged': ragged}))
+
+    # write to a new file and swap it in: savez'ing straight over the file would truncate the one that
+    # load_data() may have memory-mapped
+    fd, tmpfile = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(os.path.abspath(outfile)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **out)
+        if os.path.exists(outfile):
+            os.chmod(tmpfile, os.stat(outfile).st_mode & 0o777)
+        os.replace(tmpfile, outfile)
+    except BaseException:
+        os.remove(tmpfile)
+        raise
+
+    return
+
+def _decode_config(config):
+
+    '''Turn the bytes keys and values that come out of python 2 era pickles into strings, so the config can go through json.
+
+    '''
+
+    return {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in config.items()}
+
+
+if __name__ == '__main__':
+    # usage: python convert_npz.py data_files/ETC1.6/*.npz
+    for f in sys.argv[1:]:
+        convert_npz(f)
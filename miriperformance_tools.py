@@ -1,11 +1,33 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import pickle
 import os
-from glob import glob
-import astropy.units as u
+import gc
+import inspect
+import json
+import struct
+import zipfile
+from functools import wraps
 
-plt.style.use('seaborn-colorblind')
+# matplotlib is only imported inside the plotting functions, so that using load_data() doesn't pay for it
+
+# version of the layout that convert_npz.py writes converted data files in
+NPZ_FORMAT_VERSION = 1
+
+# data read in by load_data(), keyed on file path. Each entry also holds the inode, modification time and size of
+# the file it was read from, so that a replaced file is read in again and the arrays mapped from the old one are let go
+_DATA_CACHE = {}
+
+# off-screen figure that is cleared and reused for every plot that is only saved, created on first use by _make_figure()
+_FIG = None
+_CANVAS = None
+
+# MRS sub-band indices, 3 per channel (short, medium, long), with the legend labels for each group
+_ISHORT = np.array([0, 3, 6, 9])
+_IMED = _ISHORT + 1
+_ILONG = _ISHORT + 2
+_MRS_LABELS = ('MRS short', 'MRS medium', 'MRS long')
+
+# line colours for the MRS groups in the summary plots, one per sub-band in the order short, medium, long
+_MRS_COLORS = ('#56B4E9',) * 4 + ('#CC79A7',) * 4 + ('#F0E442',) * 4
 
 def load_data(version=None, mode=None, src=None):
 
@@ -22,6 +44,8 @@ def load_data(version=None, mode=None, src=None):
     ------
     - extended = True is incompatible with line = True
     - by default, all filters will be loaded and plotted for Imager, and all channels and sub-channels for MRS
+    - results are cached per data file, so repeated calls don't re-read the file, but a file that has been replaced or modified (its inode, modification time or size has changed) is read in again. The same dictionary is returned each time, so don't modify it in place
+    - data files MUST be saved with np.savez, not np.savez_compressed: the arrays are memory-mapped straight from the file, which only works for uncompressed members. If disk space is a concern, compress at the filesystem level instead. Replace existing files rather than writing over them, as convert_npz.py does, so arrays that are already mapped stay valid
     
     Output:
     -------
@@ -32,29 +56,271 @@ def load_data(version=None, mode=None, src=None):
     # initial checks
     assert mode in ['imaging', 'lrs', 'mrs'], "Mode not recognised"
     assert src in ['point', 'extended'], "Source type not recognised"
+    
+    f = _find_data_file(version.strip(), mode, src)
+    
+    st = os.stat(f)
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _DATA_CACHE.get(f)
+    if cached is None or cached[0] != key:
+        cached = _DATA_CACHE[f] = (key, _read_data_file(f))
+    
+    return cached[1]
+
+def _find_data_file(version, mode, src):
+    
+    '''Find the ETC data file for a version, mode and source type, which have already been checked by load_data().
+    
+    Output:
+    -------
+    - path to the file
+    
+    '''
         
     # identify the data directory from the provided ETC version
-    data_dir = './data_files/ETC{}/'.format(version.strip())
+    data_dir = './data_files/ETC{}/'.format(version)
     assert os.path.isdir(data_dir), "Data directory not found"
     
-    # now find the appropriate file
+    # now find the appropriate file: miri_<mode>_sensitivity_extended*.npz for extended sources
     if src == 'extended':
-        fname = 'miri_{}_sensitivity_extended*.npz'.format(mode)
+        prefix = 'miri_{}_sensitivity_extended'.format(mode)
+        with os.scandir(data_dir) as it:
+            f = [e.path for e in it if e.name.startswith(prefix) and e.name.endswith('.npz')]
+    # a plain file name only needs a stat(), not a scan of the whole directory
     else:
         fname = 'miri_{}_sensitivity.npz'.format(mode)
-    
-    f = glob(data_dir+fname)
-    print(f)
+        f = [data_dir+fname] if os.path.isfile(data_dir+fname) else []
     
     # check that there's only 1 file matching this pattern
     assert len(f)==1, "No single file match"
     
-    # now load the file
-    data = np.load(f[0], encoding='bytes', allow_pickle=True)
-    list(data.keys())
+    return f[0]
+
+def _read_data_file(path):
+    
+    '''Read an ETC data file for load_data(), which caches the result.
+    
+    '''
+    
+    with np.load(path, encoding='bytes', allow_pickle=True) as npz:
+        # files converted with convert_npz.py hold no object arrays and can be mapped straight from disk
+        data = _mmap_npz(path, npz.zip)
+        
+        # files that haven't been converted yet still need pickle for their object arrays. Read every
+        # array out of the archive now, so the cached copy doesn't go back to the zip file on each lookup,
+        # and the file is closed again
+        if data is None:
+            data = {k: npz[k] for k in npz.files}
+    
+    return _unpack_converted(data)
+
+def _unpack_converted(data):
+    
+    '''Undo the packing done by convert_npz.py, so that converted and original files give the same dictionary.
+    
+    Notes:
+    ------
+    - the flat arrays listed in the 'layout' member are split up again into an object array with one array per configuration. The pieces are views into the flat arrays, not copies
+    - 'configs' stored as JSON strings are turned back into dictionaries
+    - data from files that were never converted (they have no 'layout' member) is returned unchanged
+    
+    '''
+    
+    if 'layout' not in data:
+        return data
+    
+    out = dict(data)
+    layout = json.loads(str(out.pop('layout')))
+    assert layout['format_version'] == NPZ_FORMAT_VERSION, "Data file layout not recognised, convert the original file again with convert_npz.py"
+    
+    # fill element by element: handing numpy a list of equal-length arrays would give a 2D float array
+    for key, offsets in layout['ragged'].items():
+        flat = out[key]
+        out[key] = np.empty(len(offsets) - 1, dtype=object)
+        for i in range(len(offsets) - 1):
+            out[key][i] = flat[offsets[i]:offsets[i+1]]
+    
+    if 'configs' in out:
+        configs = np.empty(len(out['configs']), dtype=object)
+        for i, c in enumerate(out['configs']):
+            configs[i] = json.loads(str(c))
+        out['configs'] = configs
+    
+    return out
+
+def _mmap_npz(path, zf):
+    
+    '''Memory-map every member of an .npz file without copying the arrays into memory.
+    
+    Parameters
+    ----------
+    - path (string): path to the .npz file
+    - zf (zipfile.ZipFile): the file, already opened as a zip archive
+    
+    Output:
+    -------
+    - dictionary of read-only arrays keyed on member name, all backed by a single memory map of the file, or None if the file wasn't written by convert_npz.py or holds object arrays (these have to go through np.load)
+    
+    '''
+    
+    # files that haven't been converted need np.load, and don't have their headers read at all
+    if 'layout.npy' not in zf.namelist():
+        return None
+    
+    # read all the .npy headers before mapping anything
+    members = []
+    with open(path, 'rb') as fh:
+        for info in zf.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED, "Data file is compressed, use np.savez rather than np.savez_compressed"
+            
+            # the member's bytes start after its 30-byte local file header, file name and extra field,
+            # and begin with the .npy header
+            fh.seek(info.header_offset)
+            fname_len, extra_len = struct.unpack('<HH', fh.read(30)[26:30])
+            fh.seek(fname_len + extra_len, os.SEEK_CUR)
+            npy_version = np.lib.format.read_magic(fh)
+            if npy_version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fh)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fh)
+            if dtype.hasobject:
+                return None
+            
+            key = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            members.append((key, shape, fortran_order, dtype, fh.tell()))
+    
+    # one read-only map of the whole file, which every member is a view into: a np.memmap per member
+    # would cost an mmap call and a file descriptor each
+    mm = np.memmap(path, mode='r')
+    out = {}
+    for key, shape, fortran_order, dtype, offset in members:
+        out[key] = np.ndarray(shape, dtype=dtype, buffer=mm, offset=offset,
+                              order='F' if fortran_order else 'C')
+    
+    return out
+
+def _make_figure(save):
+    
+    '''Get an 8x6 inch figure with a single set of axes for the plotting functions.
+    
+    Notes:
+    ------
+    - if the plot is only being saved, the shared off-screen figure is cleared and handed back, so the same Agg canvas and its pixel buffer are reused for every plot. Each plot has to be saved before the next one is started
+    - otherwise a new figure is created through pyplot, so that it can be shown. pyplot isn't imported at all for plots that are only saved
+    
+    '''
+    
+    global _FIG, _CANVAS
+    
+    if save:
+        if _FIG is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            _FIG = Figure(figsize=[8,6])
+            _CANVAS = FigureCanvasAgg(_FIG)
+        _FIG.clf()
+        fig = _FIG
+        ax = fig.subplots()
+    else:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=[8,6])
+    
+    return fig, ax
+
+def _add_mrs_bands(ax, wavelengths, values, groups, colors, lw=None, rasterized=False, legend_colors=None):
+    
+    '''Draw all the MRS sub-bands on a set of axes as a single LineCollection, rather than one line per sub-band.
+    
+    Parameters:
+    -----------
+    - ax: axes to draw on. The y axis is set to log scale
+    - wavelengths, values: one array per sub-band, as returned by load_data()
+    - groups: sub-band indices for MRS short, medium and long
+    - colors: one colour per sub-band, in the order they appear in groups
+    - lw (float): line width. default: lines.linewidth
+    - rasterized (boolean): rasterize the lines in vector output? default: False
+    - legend_colors (list): colours for the 3 legend entries. default: the colour of the first sub-band of each group
+    
+    Notes:
+    ------
+    - legend(loc='best') only looks at lines and markers, not at the paths in a collection, so give the legend an explicit location
+    
+    Output:
+    -------
+    - handles: legend entries for 'MRS short', 'MRS medium' and 'MRS long'. The collection itself has no label
+    
+    '''
+    
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+    
+    order = np.concatenate(groups)
+    segments = [np.column_stack([wavelengths[i], values[i]]) for i in order]
+    
+    # the data limits are set from the points directly: a collection added to log axes works them out wrongly
+    ax.set_yscale('log')
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=lw, rasterized=rasterized), autolim=False)
+    ax.update_datalim(np.concatenate(segments))
+    ax.autoscale_view()
+    
+    # proxy lines for the legend, left at the default width unless one was given
+    line_kw = {} if lw is None else {'lw': lw}
+    if legend_colors is None:
+        legend_colors = [colors[start] for start in np.cumsum([0] + [len(g) for g in groups[:-1]])]
+    handles = [Line2D([], [], color=c, label=label, **line_kw)
+               for c, label in zip(legend_colors, _MRS_LABELS)]
+    
+    return handles
+
+def _finish_figure(fig, path, save):
+    
+    '''Save a finished figure to path, or show it if it isn't being saved.
+    
+    Notes:
+    ------
+    - a saved figure is cleared straight away, so the shared off-screen figure doesn't hold on to the last plot's axes
+    
+    '''
+    
+    if save:
+        fig.savefig(path)
+        fig.clf()
+    else:
+        fig.show()
+    
+    return
+
+def _plot_session(func):
+    
+    '''Decorator that sets up and tears down matplotlib around one of the plotting functions.
     
-    return data
+    Notes:
+    ------
+    - the style is applied only while the function runs. It used to be set with plt.style.use() on import, which changed the rcParams for everything else in the session, even if no plots were made
+    - figures only go through pyplot when they're going to be shown, in which case the ones from the previous call are closed first
+    - after plots are saved, the axes cleared off the shared figure hold reference cycles, so they're freed straight away rather than whenever the garbage collector next runs
+    
+    '''
+    
+    signature = inspect.signature(func)
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        import matplotlib.style
+        save = signature.bind(*args, **kwargs).arguments.get('save', signature.parameters['save'].default)
+        if not save:
+            import matplotlib.pyplot as plt
+            plt.close('all')
+        try:
+            with matplotlib.style.context('seaborn-colorblind'):
+                return func(*args, **kwargs)
+        finally:
+            if save:
+                gc.collect()
+    
+    return wrapper
 
+@_plot_session
 def make_imager_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     
     '''
@@ -69,8 +335,6 @@ def make_imager_plots(version=None, save=False, outfile='out.png', style='jdocs'
     
     
     '''
-    plt.close('all')
-
     src = ['point', 'extended']
     types = ['sens', 'sat']
     
@@ -84,13 +348,23 @@ def make_imager_plots(version=None, save=False, outfile='out.png', style='jdocs'
     sat_label = 'Signal reaching 70% full well in NGROUPS = 5'
     vlabel = 'Generated with ETCv{}'.format(version)
     
+    # where the plots get saved
+    out_dir = 'plots/ETC{}/'.format(version)
+    stem = outfile.rsplit('.', 1)[0]
+    if save:
+        os.makedirs(out_dir, exist_ok=True)
+    
     ylab = ['flux density (mJy)', 'surface brightness (mJy arcsec$^{-2}$)']
     
+    # read in all the data before any plotting starts
+    datasets = {s: load_data(version=version, mode='imaging', src=s) for s in src}
+    
     for s, yl in zip(src, ylab):
-        data = load_data(version=version, mode='imaging', src=s)
+        data = datasets[s]
         # first the sensitivity plot
-        fig1, ax1 = plt.subplots(figsize=[8,6])
-        ax1.semilogy(data['wavelengths'], data['lim_fluxes'], ls='', marker='o', ms=12, label='min detectable signal')
+        fig1, ax1 = _make_figure(save)
+        ax1.set_yscale('log')
+        ax1.scatter(data['wavelengths'], data['lim_fluxes'], s=12**2, linewidths=1, zorder=2, rasterized=True, label='min detectable signal')
         #ax1.semilogy(data['wavelengths'], data['lim_fluxes'], ls='', label='min detectable signal')
         ax1.set_xlabel('wavelength ($\mu$m)')
         ax1.set_ylabel(yl)
@@ -98,13 +372,11 @@ def make_imager_plots(version=None, save=False, outfile='out.png', style='jdocs'
         ax1.annotate(sens_label, (0.7,0.15), fontsize=9, xycoords='figure fraction')
         ax1.annotate(vlabel, (0.7,0.12), fontsize=9, xycoords='figure fraction')
         ax1.grid(b=True)
-        fig1.show()
-        if save:
-            new_outfile = 'plots/ETC{0}/{1}_{2}_sens.png'.format(version, outfile.split('.')[0], s)
-            plt.savefig(new_outfile)
+        _finish_figure(fig1, '{0}{1}_{2}_sens.png'.format(out_dir, stem, s), save)
         
-        fig2, ax2 = plt.subplots(figsize=[8,6])
-        ax2.semilogy(data['wavelengths'], data['sat_limits'], ls='', marker='o', ms=12, label='saturation limits')
+        fig2, ax2 = _make_figure(save)
+        ax2.set_yscale('log')
+        ax2.scatter(data['wavelengths'], data['sat_limits'], s=12**2, linewidths=1, zorder=2, rasterized=True, label='saturation limits')
         #ax2.semilogy(data['wavelengths'], data['sat_limits'], ls='', label='saturation limits')
         ax2.set_xlabel('wavelength ($\mu$m)')
         ax2.set_ylabel(yl)
@@ -112,15 +384,13 @@ def make_imager_plots(version=None, save=False, outfile='out.png', style='jdocs'
         ax2.annotate(sat_label, (0.5, 0.15), fontsize=9, xycoords='figure fraction')
         ax2.annotate(vlabel, (0.5, 0.12), fontsize=9, xycoords='figure fraction')
         ax2.grid(b=True)
-        fig2.show()
-        if save:
-            new_outfile = 'plots/ETC{0}/imager_{1}_{2}_sat.png'.format(version, outfile.split('.')[0], s)
-            plt.savefig(new_outfile)
+        _finish_figure(fig2, '{0}imager_{1}_{2}_sat.png'.format(out_dir, stem, s), save)
             
             
     return
         
         
+@_plot_session
 def make_lrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     
     '''
@@ -135,7 +405,6 @@ def make_lrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     
     
     '''
-    plt.close('all')
     
     # LRS only has point source numbers
     src = ['point']
@@ -152,11 +421,19 @@ def make_lrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     vlabel = 'Generated with ETCv{}'.format(version)
     frame_ratio = 0.159 / 2.7705
     
+    # where the plots get saved
+    out_dir = 'plots/ETC{}/'.format(version)
+    stem = outfile.rsplit('.', 1)[0]
+    if save:
+        os.makedirs(out_dir, exist_ok=True)
+    
     for s in src:
         data = load_data(version=version, mode='lrs', src=s)
         print(data['configs'])
+        # slitless saturation limits, scaled once for the shorter SLITLESSPRISM frame time
+        slitless_sat = np.asarray(data['sat_limits'][0], dtype=np.float64) / frame_ratio
         # first the sensitivity plot
-        fig1, ax1 = plt.subplots(figsize=[8,6])
+        fig1, ax1 = _make_figure(save)
         ax1.semilogy(data['wavelengths'][1], data['lim_fluxes'][1], ls='-', lw=2, label='slit')
         ax1.semilogy(data['wavelengths'][0], data['lim_fluxes'][0], ls='-', lw=2, label='slitless')
         ax1.set_xlabel('wavelength ($\mu$m)', fontsize='large')
@@ -166,14 +443,11 @@ def make_lrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
         ax1.annotate(vlabel, (0.7, 0.12), fontsize=10, xycoords='figure fraction')
         ax1.grid(alpha=0.5, which='both')
         ax1.legend(loc='best', fontsize='large')
-        fig1.show()
-        if save:
-            new_outfile = 'plots/ETC{0}/lrs_{1}_{2}_sens.png'.format(version, outfile.split('.')[0], s)
-            plt.savefig(new_outfile)
+        _finish_figure(fig1, '{0}lrs_{1}_{2}_sens.png'.format(out_dir, stem, s), save)
         
-        fig2, ax2 = plt.subplots(figsize=[8,6])
+        fig2, ax2 = _make_figure(save)
         ax2.semilogy(data['wavelengths'][1], data['sat_limits'][1], ls='-', lw=2, label='slit')
-        ax2.semilogy(data['wavelengths'][0], data['sat_limits'][0] / frame_ratio, ls='-', lw=2, label='slitless')
+        ax2.semilogy(data['wavelengths'][0], slitless_sat, ls='-', lw=2, label='slitless')
         ax2.set_xlabel('wavelength ($\mu$m)', fontsize='large')
         ax2.set_ylabel('flux density (mJy)', fontsize='large')
         ax2.set_title('MIRI LRS bright limits ({} sources)'.format(s))
@@ -181,16 +455,14 @@ def make_lrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
         ax2.annotate(vlabel, (9., 1.5), fontsize=10)
         ax2.grid(alpha=0.5, which='both')
         ax2.legend(loc='best', fontsize='large')
-        fig2.show()
-        if save:
-            new_outfile = 'plots/ETC{0}/lrs_{1}_{2}_sat.png'.format(version, outfile.split('.')[0], s)
-            plt.savefig(new_outfile)
+        _finish_figure(fig2, '{0}lrs_{1}_{2}_sat.png'.format(out_dir, stem, s), save)
             
             
     return
 
 
 
+@_plot_session
 def make_mrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     
     '''
@@ -205,18 +477,18 @@ def make_mrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     
     
     '''
-    plt.close('all')
-    
-    
+    import matplotlib
+
     # LRS only has point source numbers
     src = ['point', 'extended']
     types = ['sens', 'sat']
     ylab = ['flux density (mJy)', 'surface brightness (mJy arcsec$^{-2}$)']
     
-    ishort = [0, 3, 6, 9]
-    imed = [i + 1 for i in ishort]
-    ilong = [i + 2 for i in ishort]
-    mrslabs = ['MRS short', '', '', '', 'MRS medium', '', '', '', 'MRS long', '', '', '']
+    # one colour per sub-band in drawing order, taken from the style's colour cycle. The legend keeps the
+    # colours of sub-bands 0, 4 and 8 (drawn 1st, 6th and 11th), which is where the labels used to sit
+    cycle = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [cycle[i % len(cycle)] for i in range(12)]
+    legend_colors = [colors[0], colors[5], colors[10]]
     
     # Parsing for each channel
     ichan1 = [0, 1, 2]                        #S,M,L
@@ -230,17 +502,22 @@ def make_mrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
     vlabel = 'Generated with ETCv{}'.format(version)
     frame_ratio = 0.159 / 2.7705
     
+    # where the plots get saved
+    out_dir = 'plots/ETC{}/'.format(version)
+    stem = outfile.rsplit('.', 1)[0]
+    if save:
+        os.makedirs(out_dir, exist_ok=True)
+    
+    # read in all the data before any plotting starts
+    datasets = {s: load_data(version=version, mode='mrs', src=s) for s in src}
+    
     for s, yl in zip(src, ylab):
-        data = load_data(version=version, mode='mrs', src=s)
+        data = datasets[s]
         #print(list(data.keys()))
         # first the sensitivity plot
-        fig1, ax1 = plt.subplots(figsize=[8,6])
-        for sh in ishort:
-            ax1.semilogy(data['wavelengths'][sh], data['lim_fluxes'][sh], lw=2, label = mrslabs[sh])
-        for m in imed:
-            ax1.semilogy(data['wavelengths'][m], data['lim_fluxes'][m], lw=2, label = mrslabs[m])
-        for l in ilong:
-            ax1.semilogy(data['wavelengths'][l], data['lim_fluxes'][l], lw=2, label = mrslabs[l])
+        fig1, ax1 = _make_figure(save)
+        handles = _add_mrs_bands(ax1, data['wavelengths'], data['lim_fluxes'], [_ISHORT, _IMED, _ILONG], colors, lw=2,
+                                 legend_colors=legend_colors)
         
         
         #ax1.set_xlabel('wavelength ($\mu$m)', fontsize='large')
@@ -250,19 +527,12 @@ def make_mrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
         ax1.annotate(sens_label, (0.7,0.15), fontsize=9, xycoords='figure fraction')
         ax1.annotate(vlabel, (0.7, 0.12), fontsize=9, xycoords='figure fraction')
         ax1.grid(alpha=0.5, which='both')
-        ax1.legend(loc='best', fontsize='large')
-        fig1.show()
-        if save:
-            new_outfile = 'plots/ETC{0}/mrs_{1}_{2}_sens.png'.format(version, outfile.split('.')[0], s)
-            plt.savefig(new_outfile)
+        ax1.legend(handles=handles, loc='upper left', fontsize='large')
+        _finish_figure(fig1, '{0}mrs_{1}_{2}_sens.png'.format(out_dir, stem, s), save)
         
-        fig2, ax2 = plt.subplots(figsize=[8,6])
-        for sh in ishort:
-            ax2.semilogy(data['wavelengths'][sh], data['sat_limits'][sh], lw=2, label = mrslabs[sh])
-        for m in imed:
-            ax2.semilogy(data['wavelengths'][m], data['sat_limits'][m], lw=2,  label = mrslabs[m])
-        for l in ilong:
-            ax2.semilogy(data['wavelengths'][l], data['sat_limits'][l], lw=2,  label = mrslabs[l])
+        fig2, ax2 = _make_figure(save)
+        handles = _add_mrs_bands(ax2, data['wavelengths'], data['sat_limits'], [_ISHORT, _IMED, _ILONG], colors, lw=2,
+                                 legend_colors=legend_colors)
         ax2.set_xlabel('wavelength ($\mu$m)', fontsize='large')
         ax2.set_ylabel(yl, fontsize='large')
         ax2.set_title('MIRI MRS bright limits ({} sources)'.format(s))
@@ -271,16 +541,14 @@ def make_mrs_plots(version=None, save=False, outfile='out.png', style='jdocs'):
         #ax2.annotate(vlabel, (17.5, 1.5e4), fontsize=9)
         ax2.annotate(vlabel, (0.5, 0.12), fontsize=9, xycoords='figure fraction')
         ax2.grid(alpha=0.5, which='both')
-        ax2.legend(loc='best', fontsize='large')
-        fig2.show()
-        if save:
-            new_outfile = 'plots/ETC{0}/mrs_{1}_{2}_sat.png'.format(version, outfile.split('.')[0], s)
-            plt.savefig(new_outfile)
+        ax2.legend(handles=handles, loc='upper left', fontsize='large')
+        _finish_figure(fig2, '{0}mrs_{1}_{2}_sat.png'.format(out_dir, stem, s), save)
             
             
     return
     
     
+@_plot_session
 def sens_plot(version=None, save=False, outfile='out.png', style='jdocs'):
     
     '''
@@ -295,12 +563,6 @@ def sens_plot(version=None, save=False, outfile='out.png', style='jdocs'):
     
     
     '''
-    plt.close('all')
-    
-    ishort = [0, 3, 6, 9]
-    imed = [i + 1 for i in ishort]
-    ilong = [i + 2 for i in ishort]
-    mrslabs = ['MRS short', '', '', '', 'MRS medium', '', '', '', 'MRS long', '', '', '']
     
     modes = ['imaging', 'lrs', 'mrs']
     
@@ -310,36 +572,37 @@ def sens_plot(version=None, save=False, outfile='out.png', style='jdocs'):
     sens_label = 'SNR = 10 in 10 ksec'
     vlabel = 'Generated with ETCv{}'.format(version)
     
-    fig, ax = plt.subplots(figsize=[8,6])
+    # where the plots get saved
+    out_dir = 'plots/ETC{}/'.format(version)
+    if save:
+        os.makedirs(out_dir, exist_ok=True)
+    
+    # read in all the data before any plotting starts
+    datasets = {m: load_data(mode=m, version=version, src='point') for m in modes}
+    
+    fig, ax = _make_figure(save)
     
     for m in modes:
-        data = load_data(mode=m, version=version, src='point')
+        data = datasets[m]
         if m == 'imaging':
             ax.semilogy(data['wavelengths'], data['lim_fluxes'], ls = '', marker='o', ms=10, label='imager')
         elif m == 'lrs':
             ax.semilogy(data['wavelengths'][0], data['lim_fluxes'][0], lw=2, label='LRS slitless')
             ax.semilogy(data['wavelengths'][1], data['lim_fluxes'][1], lw=2, label='LRS slit')
         else:
-            for sh in ishort:
-                ax.semilogy(data['wavelengths'][sh], data['lim_fluxes'][sh], lw=2, c='#56B4E9', label = mrslabs[sh])
-            for m in imed:
-                ax.semilogy(data['wavelengths'][m], data['lim_fluxes'][m], lw=2, c='#CC79A7', label = mrslabs[m])
-            for l in ilong:
-                ax.semilogy(data['wavelengths'][l], data['lim_fluxes'][l], lw=2, c='#F0E442', label = mrslabs[l])
+            mrs_handles = _add_mrs_bands(ax, data['wavelengths'], data['lim_fluxes'], [_ISHORT, _IMED, _ILONG], _MRS_COLORS,
+                                         lw=2, rasterized=True)
     ax.set_xlabel('wavelength ($\mu$m)')
     ax.set_ylabel('flux density (mJy)', fontsize='large')
     ax.set_title('MIRI point source sensitivities (continuum)')
     ax.annotate(sens_label, (0.7,0.15), fontsize=9, xycoords='figure fraction')
     ax.annotate(vlabel, (0.7, 0.12), fontsize=9, xycoords='figure fraction')
     ax.grid(alpha=0.5, which='both')
-    ax.legend(loc='best', fontsize='large')
-    fig.show()
-    
-    if save:
-        new_outfile = 'plots/ETC{0}/sens_all_point_v{0}.png'.format(version)
-        plt.savefig(new_outfile)
+    ax.legend(handles=ax.get_legend_handles_labels()[0] + mrs_handles, loc='upper left', fontsize='large')
+    _finish_figure(fig, '{0}sens_all_point_v{1}.png'.format(out_dir, version), save)
     return 
     
+@_plot_session
 def bright_plot(version=None, save=False, outfile='out.png', style='jdocs'):
     
     '''
@@ -354,12 +617,6 @@ def bright_plot(version=None, save=False, outfile='out.png', style='jdocs'):
     
     
     '''
-    plt.close('all')
-    
-    ishort = [0, 3, 6, 9]
-    imed = [i + 1 for i in ishort]
-    ilong = [i + 2 for i in ishort]
-    mrslabs = ['MRS short', '', '', '', 'MRS medium', '', '', '', 'MRS long', '', '', '']
     
     modes = ['imaging', 'lrs', 'mrs']
     
@@ -371,33 +628,33 @@ def bright_plot(version=None, save=False, outfile='out.png', style='jdocs'):
     sat_label = 'Signal reaching 70% full well in NGROUPS = 5'
     vlabel = 'Generated with ETCv{}'.format(version)
     
-    fig, ax = plt.subplots(figsize=[8,6])
+    # where the plots get saved
+    out_dir = 'plots/ETC{}/'.format(version)
+    if save:
+        os.makedirs(out_dir, exist_ok=True)
+    
+    # read in all the data before any plotting starts
+    datasets = {m: load_data(mode=m, version=version, src='point') for m in modes}
+    im, lrs, mrs = datasets['imaging'], datasets['lrs'], datasets['mrs']
+    # slitless saturation limits, scaled once for the shorter SLITLESSPRISM frame time
+    slitless_sat = np.asarray(lrs['sat_limits'][0], dtype=np.float64) / frame_ratio
+    
+    fig, ax = _make_figure(save)
 
     
-    im = load_data(mode='imaging', version=version, src='point')
     ax.semilogy(im['wavelengths'], im['sat_limits'], ls = '', marker='o', ms=10, label='imager')
-    lrs = load_data(mode='lrs', version=version, src='point')
-    ax.semilogy(lrs['wavelengths'][0], lrs['sat_limits'][0] / frame_ratio, lw=2, label='LRS slitless')
+    ax.semilogy(lrs['wavelengths'][0], slitless_sat, lw=2, label='LRS slitless')
     ax.semilogy(lrs['wavelengths'][1], lrs['sat_limits'][1], lw=2, label='LRS slit')
-    mrs = load_data(mode='mrs', version=version, src='point')
-    for sh in ishort:
-        ax.semilogy(mrs['wavelengths'][sh], mrs['sat_limits'][sh], c='#56B4E9', label = mrslabs[sh])
-    for m in imed:
-        ax.semilogy(mrs['wavelengths'][m], mrs['sat_limits'][m], c='#CC79A7',  label = mrslabs[m])
-    for l in ilong:
-        ax.semilogy(mrs['wavelengths'][l], mrs['sat_limits'][l], c='#F0E442',  label = mrslabs[l])
+    mrs_handles = _add_mrs_bands(ax, mrs['wavelengths'], mrs['sat_limits'], [_ISHORT, _IMED, _ILONG], _MRS_COLORS,
+                                 rasterized=True)
     ax.set_xlabel('wavelength ($\mu$m)')
     ax.set_ylabel('flux density (mJy)', fontsize='large')
     ax.set_title('MIRI point source bright limits (continuum)')
     ax.annotate(sat_label, (0.5,0.15), fontsize=9, xycoords='figure fraction')
     ax.annotate(vlabel, (0.5, 0.12), fontsize=9, xycoords='figure fraction')
     #ax.grid(alpha=0.5, which='both')
-    ax.legend(loc='best')
-    fig.show()
-    
-    if save:
-        new_outfile = 'plots/ETC{0}/bright_all_point_v{0}.png'.format(version)
-        plt.savefig(new_outfile)
+    ax.legend(handles=ax.get_legend_handles_labels()[0] + mrs_handles, loc='upper left')
+    _finish_figure(fig, '{0}bright_all_point_v{1}.png'.format(out_dir, version), save)
     return 
     
     